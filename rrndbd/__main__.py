@@ -0,0 +1,20 @@
+import argparse
+from .serve import serve, DEFAULT_HOST, DEFAULT_PORT
+
+
+def main():
+    parser = argparse.ArgumentParser(prog = 'rrndbd')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+
+    serve_parser = commands.add_parser('serve', help = 'run the local computation and plotting server')
+    serve_parser.add_argument('--host', default = DEFAULT_HOST)
+    serve_parser.add_argument('--port', type = int, default = DEFAULT_PORT)
+    serve_parser.add_argument('--workers', type = int, default = None, help = 'number of render processes')
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        serve(args.host, args.port, args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -18,6 +18,14 @@ class BasePlot:
     def save(self, filename):
         self.fig.savefig(filename, bbox_inches = 'tight')
 
+    @classmethod
+    def cached_save(cls, filename, *args, cache = None, **kwargs):
+        '''Saves cls(*args, **kwargs) to filename through the render cache, only building
+        the figure if nothing that affects it has changed since it was last rendered.'''
+        from .cache import get_render_cache
+        cache = cache if cache is not None else get_render_cache()
+        return cache.save(cls, filename, *args, **kwargs)
+
     def logscalexy(self):
         '''Sets both x and y axes on a log scale.'''
         self.ax.set_xscale('log')
@@ -0,0 +1,219 @@
+import hashlib
+import inspect
+import json
+import numbers
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+from .constants import constants_fingerprint
+from .style import AVAILABLE_THEMES
+
+CACHE_DIR = Path.home() / '.cache' / 'rrndbd' / 'renders'
+MAX_CACHE_BYTES = 256 * 1024**2  # 256 MB of rendered figures
+TMP_SUFFIX = '.tmp'
+
+# Module-level cache, shared by every cached_save call that doesn't bring its own
+_RENDER_CACHE = None
+
+
+class RenderCache:
+    '''A content-addressed, size-bounded store of rendered figures. Entries are keyed on
+    everything that can change a figure: the plot class, its constructor arguments, the PDG
+    constants, the constraints, the mplstyle files and the output format. The least recently
+    used renders are evicted once the cache grows past max_bytes.
+
+    There is no index: the directory itself is the cache, and file modification times are the
+    LRU order (a hit touches its file). That way several processes can share one cache
+    directory without overwriting each other's view of it.'''
+
+    def __init__(self, directory = CACHE_DIR, max_bytes : int = MAX_CACHE_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents = True, exist_ok = True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, plot_cls, fmt, args = (), kwargs = None):
+        '''Hashes everything that goes into a render into a file name for the cache. The
+        arguments are bound to plot_cls's signature first, so spelling the same call
+        differently (positionally, with explicit defaults, 2 vs 2.0) gives the same key.'''
+        from . import lobster
+
+        # Hash the constraints the plots will actually draw from, not the yaml on disk
+        if not lobster.CONSTRAINTS:
+            lobster.load_constraints_from_yaml(lobster.PATH_TO_CONSTRAINTS)
+
+        digest = hashlib.sha256()
+        digest.update(f'{plot_cls.__module__}.{plot_cls.__qualname__}'.encode())
+        digest.update(_hash_argument(_bind_arguments(plot_cls, args, kwargs or {})).encode())
+        digest.update(constants_fingerprint().encode())
+        digest.update(json.dumps(lobster.CONSTRAINTS, sort_keys = True, default = str).encode())
+        for theme in sorted(AVAILABLE_THEMES):
+            digest.update(_file_digest(AVAILABLE_THEMES[theme]).encode())
+
+        return f'{digest.hexdigest()}.{fmt}'
+
+    def save(self, plot_cls, filename, *args, **kwargs):
+        '''Writes the figure plot_cls(*args, **kwargs) to filename. If an identical render is
+        already cached it is copied over and the figure is never built. Returns True on a hit.'''
+        fmt = Path(filename).suffix.lstrip('.') or plt.rcParams['savefig.format']
+        key = self.key(plot_cls, fmt, args, kwargs)
+        artifact = self.directory / key
+
+        if artifact.exists():
+            try:
+                shutil.copyfile(artifact, filename)
+                os.utime(artifact)
+                self.hits += 1
+                return True
+            except FileNotFoundError:
+                # Only a render evicted by another process in the meantime is a miss; a
+                # destination that can't be written to is the caller's error
+                if artifact.exists():
+                    raise
+
+        self.misses += 1
+        plot = plot_cls(*args, **kwargs)
+        fd, tmp = tempfile.mkstemp(dir = self.directory, prefix = key + '.', suffix = TMP_SUFFIX)
+        os.close(fd)
+        try:
+            plot.fig.savefig(tmp, format = fmt, bbox_inches = 'tight')
+            os.replace(tmp, artifact)
+        finally:
+            plt.close(plot.fig)
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+        # The render is cached before it is copied out, so a bad filename doesn't waste it
+        self.evict(keep = key)
+        shutil.copyfile(artifact, filename)
+        return False
+
+    def entries(self):
+        '''(mtime, size, path) of every cached render, least recently used first.'''
+        found = []
+        for path in self.directory.iterdir():
+            if path.name.endswith(TMP_SUFFIX):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            found.append((stat.st_mtime_ns, stat.st_size, path))
+        return sorted(found)
+
+    def evict(self, keep = None):
+        '''Drops least recently used renders until the cache fits in max_bytes. The entry
+        named keep (the one just written) is never dropped, even if it alone is too big.'''
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path.name == keep:
+                continue
+            try:
+                path.unlink()
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            path.unlink(missing_ok = True)
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def stats(self):
+        '''Returns a dictionary summarizing cache usage. Hits, misses and evictions count this
+        instance's lookups; entries and bytes describe the shared directory.'''
+        lookups = self.hits + self.misses
+        entries = self.entries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+        }
+
+    def report(self):
+        '''A human readable version of stats().'''
+        s = self.stats()
+        return (f"Render cache at {self.directory}\n"
+                f"  hits: {s['hits']}  misses: {s['misses']}  hit rate: {s['hit_rate']:.1%}\n"
+                f"  entries: {s['entries']}  evictions: {s['evictions']}\n"
+                f"  size: {s['bytes']/1024**2:.1f} / {s['max_bytes']/1024**2:.1f} MB")
+
+
+def get_render_cache():
+    '''Returns the default RenderCache, created on first call.'''
+    global _RENDER_CACHE
+    if _RENDER_CACHE is None:
+        _RENDER_CACHE = RenderCache()
+    return _RENDER_CACHE
+
+
+def _bind_arguments(plot_cls, args, kwargs):
+    '''plot_cls's constructor arguments as a name -> value dict with the defaults filled in.
+    Keyword arguments a plot passes on to BasePlot are bound against BasePlot's signature.'''
+    from .base import BasePlot
+
+    arguments = {}
+    for cls in (plot_cls, BasePlot):
+        bound = inspect.signature(cls).bind(*args, **kwargs)
+        bound.apply_defaults()
+        args, kwargs, forwards = (), {}, False
+        for name, value in bound.arguments.items():
+            if bound.signature.parameters[name].kind == inspect.Parameter.VAR_KEYWORD:
+                kwargs, forwards = value, True
+            else:
+                arguments[name] = value
+        if not forwards or not issubclass(plot_cls, BasePlot) or plot_cls.__init__ is BasePlot.__init__:
+            break
+
+    arguments.update(kwargs)
+    return arguments
+
+
+def _hash_argument(arg):
+    '''A stable string representation of a constructor argument. Numbers are compared by
+    value, so 2, 2.0 and np.float64(2) agree, and numeric arrays and sequences are hashed by
+    content, so that two identical np.logspace calls map to the same key.'''
+    if isinstance(arg, np.generic):
+        arg = arg.item()
+    if isinstance(arg, (list, tuple)) and arg and all(_is_number(a) for a in arg):
+        arg = np.asarray(arg, dtype = float)
+    if isinstance(arg, np.ndarray):
+        if arg.dtype.kind in 'iuf':
+            arg = arg.astype(float)
+        return f'ndarray({arg.dtype},{arg.shape},{hashlib.sha256(np.ascontiguousarray(arg).tobytes()).hexdigest()})'
+    if _is_number(arg):
+        return repr(float(arg))
+    if isinstance(arg, dict):
+        return '{' + ','.join(f'{k!r}:{_hash_argument(v)}' for k, v in sorted(arg.items(), key = lambda kv: repr(kv[0]))) + '}'
+    if isinstance(arg, (list, tuple)):
+        return 'sequence(' + ','.join(_hash_argument(a) for a in arg) + ')'
+    return repr(arg)
+
+
+def _is_number(arg):
+    return isinstance(arg, (numbers.Real, np.number)) and not isinstance(arg, (bool, np.bool_))
+
+
+def _file_digest(filename):
+    '''Hash of a file's contents, or of its absence.'''
+    path = Path(filename)
+    if not path.exists():
+        return 'missing:' + str(path)
+    return hashlib.sha256(path.read_bytes()).hexdigest()
@@ -1,3 +1,4 @@
+import hashlib
 import pdg
 import numpy as np
 from scipy.constants import physical_constants
@@ -76,4 +77,11 @@ def pmns():
     ], dtype=complex)
 
     _PMNS = U
-    return _PMNS
\ No newline at end of file
+    return _PMNS
+
+def constants_fingerprint():
+    '''Returns a short hash of the cached neutrino constants (values and errors).
+    Anything derived from the constants can be stamped with this to know when it is stale.'''
+    const = fetch_neutrino_constants()
+    snapshot = sorted((param, repr(info['value']), repr(info['error'])) for param, info in const.items())
+    return hashlib.sha256(repr(snapshot).encode()).hexdigest()[:16]
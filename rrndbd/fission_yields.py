@@ -2,8 +2,12 @@ from .base import BasePlot
 from matplotlib.patches import Rectangle
 import numpy as np
 import pandas as pd
+from pathlib import Path
 
-FISSION_FILE = 'rrndbd/data/fission_yields.csv'
+FISSION_FILE = Path(__file__).parent / 'data' / 'fission_yields.csv'
+
+# Module-level cache of the grouped yields, one per file
+_FISSION_YIELDS = {}
 
 class FissionYieldPlot(BasePlot):
     '''A class for the nuclear fission product histograms. Can also show the Ashton binding energy curve '''
@@ -59,8 +63,13 @@ class FissionYieldPlot(BasePlot):
 
 def get_fission_yields(filename: str = FISSION_FILE):
     """Reads in the CSV file with the fission product data and computes 
-    summed fission product yields and binding energy statistics grouped by A."""
-    
+    summed fission product yields and binding energy statistics grouped by A.
+    The table is only read once per file; callers get their own copy."""
+
+    global _FISSION_YIELDS
+    if str(filename) in _FISSION_YIELDS:
+        return _FISSION_YIELDS[str(filename)].copy()
+
     nuke_data = pd.read_csv(filename)
     nuke_data['a'] = nuke_data['z'] + nuke_data['n']
     nuke_data['MeV'] = nuke_data['bindingEnergy'] / 1000
@@ -76,4 +85,5 @@ def get_fission_yields(filename: str = FISSION_FILE):
         )
     )
 
-    return grouped
\ No newline at end of file
+    _FISSION_YIELDS[str(filename)] = grouped
+    return grouped.copy()
\ No newline at end of file
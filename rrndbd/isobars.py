@@ -2,9 +2,13 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
+from pathlib import Path
 from .base import BasePlot
 
-MASS_FILE = 'rrndbd/data/isobars136.csv'
+MASS_FILE = Path(__file__).parent / 'data' / 'isobars136.csv'
+
+# Module-level cache of the raw mass tables, one per file
+_MASS_TABLES = {}
 
 class IsobarsPlot(BasePlot):
     '''A class for plotting the A = 136 isobars to demonstrate that Xe-136 must undergo double beta decay'''
@@ -59,8 +63,10 @@ class IsobarsPlot(BasePlot):
 def get_isobars(filename :str = MASS_FILE, isobar : int = 136, min_max = (53, 60)):
     '''This organizes the isobar data from the binding energy file (BE_FILE) and prepares it to be plotted. The global variable ISOBARS will point to it.'''
 
-    global ISOBARS
-    all = pd.read_csv(MASS_FILE)
+    global ISOBARS, _MASS_TABLES
+    if str(filename) not in _MASS_TABLES:
+        _MASS_TABLES[str(filename)] = pd.read_csv(filename)
+    all = _MASS_TABLES[str(filename)]
 
     ISOBARS = all[all['z'] + all['n'] == isobar].copy()
 
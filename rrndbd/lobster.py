@@ -4,6 +4,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 from scipy.optimize import fsolve
 import yaml
+from pathlib import Path
 
 
 _NEUTRINO_CONSTANTS = fetch_neutrino_constants()
@@ -16,11 +17,13 @@ DCP =   (_NEUTRINO_CONSTANTS['dcp']['value'],   _NEUTRINO_CONSTANTS['dcp']['erro
 
 # Empty dictionary to house the experimental constraints on this parameter space
 CONSTRAINTS = {}
-PATH_TO_CONSTRAINTS = 'rrndbd/data/nu_mass_constraints.yml'
+PATH_TO_CONSTRAINTS = Path(__file__).parent / 'data' / 'nu_mass_constraints.yml'
+DEFAULT_MIN_MASSES = np.logspace(-4,0,100)
+DEFAULT_MIN_MASSES.flags.writeable = False
 
 class LobsterPlot(BasePlot):
 
-    def __init__(self, min_masses = None, 
+    def __init__(self, min_masses = DEFAULT_MIN_MASSES, 
                 cosmo_constraint : bool = True, 
                 beta_constraint : bool = True,
                 bdnd_constraint : bool = True, **kwargs):
@@ -30,7 +33,7 @@ class LobsterPlot(BasePlot):
         super().__init__(**kwargs)
 
         ## Plot x data:
-        self.min_masses = min_masses if min_masses is not None else np.logspace(-4,0,100)
+        self.min_masses = min_masses if min_masses is not None else DEFAULT_MIN_MASSES
 
         ## Plot look and labels:
         self.xlabel = r'$m_{\mathrm{lightest}}$ [eV]'
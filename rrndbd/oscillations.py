@@ -1 +1,197 @@
-# Plots of neutrino oscillation data / experiments: Daya Bay, etc...
\ No newline at end of file
+# Plots of neutrino oscillation data / experiments: Daya Bay, etc...
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+import math
+import os
+import numpy as np
+from .constants import fetch_neutrino_constants, pmns
+from .lobster import neutrino_masses
+
+FLAVOURS = {'e': 0, 'mu': 1, 'tau': 2}
+
+# Phase of m^2 L / 2E for m^2 in eV^2, L in km and E in GeV (twice the usual 1.267)
+PHASE_FACTOR = 2 * 1.26693
+
+
+def oscillation_probability(alpha, beta, L, E, mmin = 0, inverted = False):
+    '''Three-flavour vacuum oscillation probability P(alpha -> beta) for baseline(s) L [km]
+    and energy(ies) E [GeV], using the PDG PMNS matrix and mass splittings. alpha and beta
+    are flavour names ('e', 'mu', 'tau'); L and E broadcast against each other.'''
+
+    U = pmns()
+    a, b = FLAVOURS[alpha], FLAVOURS[beta]
+    masses = np.array(neutrino_masses(mmin, inverted), dtype = float)
+
+    L_over_E = np.asarray(L, dtype = float) / np.asarray(E, dtype = float)
+    phases = np.exp(-1j * PHASE_FACTOR * np.multiply.outer(L_over_E, masses**2))
+
+    amplitude = phases @ (np.conj(U[a]) * U[b])
+    return np.abs(amplitude)**2
+
+
+# --- N-flavour (3 + N sterile) oscillations -------------------------------
+
+# Matter potential 2 sqrt(2) G_F N_e E in eV^2, per g/cm^3 of density and GeV of energy,
+# for an electron fraction of 1/2
+MATTER_FACTOR = 7.63e-5
+SCAN_WORKERS = None  # default to one process per core
+
+STERILE_ANGLES = {'e': (1, 4), 'mu': (2, 4), 'tau': (3, 4)}
+
+
+def rotation_order(n):
+    '''The default order of the rotations making up an n-flavour mixing matrix,
+    U = R_{n-1,n} ... R_{1,n} ... R_{2,3} R_{1,3} R_{1,2}, which is the PDG convention
+    for n = 3 and the usual R34 R24 R14 R23 R13 R12 for 3+1.'''
+    return [(i, j) for j in range(n, 1, -1) for i in range(j - 1, 0, -1)]
+
+
+def mixing_matrix(n, angles, phases = None, order = None):
+    '''Builds an n x n unitary mixing matrix as a product of complex rotations. angles and
+    phases map 1-based index pairs (i, j) to radians; pairs that are missing are not rotated.
+    The result is cached, so repeated calls with the same parameters (e.g. across an energy
+    scan) are free. The returned array is read-only.'''
+    angles = tuple(sorted((tuple(k), float(v)) for k, v in angles.items()))
+    phases = tuple(sorted((tuple(k), float(v)) for k, v in (phases or {}).items()))
+    order = tuple(order) if order is not None else tuple(rotation_order(n))
+    return _cached_mixing_matrix(n, angles, phases, order)
+
+
+@lru_cache(maxsize = 4096)
+def _cached_mixing_matrix(n, angles, phases, order):
+    angles, phases = dict(angles), dict(phases)
+    U = np.eye(n, dtype = complex)
+
+    for i, j in order:
+        theta = angles.get((i, j), 0.0)
+        if theta == 0.0:
+            continue
+        c, s = np.cos(theta), np.sin(theta)
+        delta = phases.get((i, j), 0.0)
+
+        R = np.eye(n, dtype = complex)
+        R[i - 1, i - 1] = R[j - 1, j - 1] = c
+        R[i - 1, j - 1] = s * np.exp(-1j * delta)
+        R[j - 1, i - 1] = -s * np.exp(1j * delta)
+        U = U @ R
+
+    U.setflags(write = False)
+    return U
+
+
+def three_plus_n_mixing(sterile_angles = None, sterile_phases = None, n_sterile : int = 1):
+    '''Mixing matrix for three active plus n_sterile sterile neutrinos, with the three-flavour
+    angles and Dirac phase from the PDG and the extra rotations given in sterile_angles and
+    sterile_phases (1-based (i, j) pairs with j > 3, in radians).'''
+    const = fetch_neutrino_constants()
+    angles = {
+        (1, 2): np.arcsin(np.sqrt(const['sst12']['value'])),
+        (1, 3): np.arcsin(np.sqrt(const['sst13']['value'])),
+        (2, 3): np.arcsin(np.sqrt(const['sst23']['value'])),
+    }
+    phases = {(1, 3): np.deg2rad(const['dcp']['value'])}
+    angles.update(sterile_angles or {})
+    phases.update(sterile_phases or {})
+    return mixing_matrix(3 + n_sterile, angles, phases)
+
+
+def three_plus_n_masses_squared(sterile_dm2, mmin = 0, inverted = False):
+    '''Squared masses [eV^2] of the three active states followed by the sterile ones, where
+    sterile_dm2 holds Delta m^2_{k1} for k = 4, 5, ...'''
+    m1, m2, m3 = neutrino_masses(mmin, inverted)
+    active = np.array([m1, m2, m3], dtype = float)**2
+    return np.concatenate([active, active[0] + np.atleast_1d(np.asarray(sterile_dm2, dtype = float))])
+
+
+def evolution_operators(U, masses_squared, L, E, density = 0.0, antineutrino = False):
+    '''Flavour-basis evolution operators S (with S[..., beta, alpha] the amplitude for
+    alpha -> beta) over a baseline L [km] of constant density [g/cm^3] at energy E [GeV].
+
+    U (..., n, n), masses_squared (..., n), L and E broadcast against each other's leading
+    (batch) dimensions, so a whole energy scan for a batch of parameter points is one call.
+    In vacuum the mass basis diagonalizes the Hamiltonian already; in matter the batch of
+    Hamiltonians goes through one batched eigendecomposition. The first three flavours are
+    taken as active (e, mu, tau) and the rest as sterile.'''
+    U = np.asarray(U)
+    masses_squared = np.asarray(masses_squared, dtype = float)
+    L_over_E = (np.asarray(L, dtype = float) / np.asarray(E, dtype = float))[..., None]
+    if antineutrino:
+        U = np.conj(U)
+
+    if density == 0.0:
+        # S = U exp(-i m^2 L / 2E) U^dagger
+        phases = np.exp(-1j * PHASE_FACTOR * masses_squared * L_over_E)
+        return (U * phases[..., None, :]) @ np.conj(np.swapaxes(U, -1, -2))
+
+    n = U.shape[-1]
+    # 2E H in the flavour basis, in eV^2: CC potential for nu_e, NC for the active flavours
+    # relative to the steriles (taking equal numbers of neutrons and electrons)
+    a_cc = MATTER_FACTOR * density * np.asarray(E, dtype = float) * (-1 if antineutrino else 1)
+    potential = np.zeros(np.shape(a_cc) + (n,))
+    potential[..., :3] = -a_cc[..., None] / 2
+    potential[..., 0] += a_cc
+
+    H = (U * masses_squared[..., None, :]) @ np.conj(np.swapaxes(U, -1, -2))
+    H = H + potential[..., :, None] * np.eye(n)
+    w, V = np.linalg.eigh(H)
+    phases = np.exp(-1j * PHASE_FACTOR * w * L_over_E)
+    return (V * phases[..., None, :]) @ np.conj(np.swapaxes(V, -1, -2))
+
+
+def transition_probabilities(U, masses_squared, L, E, density = 0.0, antineutrino = False):
+    '''All n x n probabilities, P[..., alpha, beta] = P(alpha -> beta). See evolution_operators
+    for the arguments.'''
+    S = evolution_operators(U, masses_squared, L, E, density, antineutrino)
+    return np.swapaxes(np.abs(S)**2, -1, -2)
+
+
+def sterile_survival_probability(flavour, L, E, dm41, sin2_2theta):
+    '''3+1 survival probability P(alpha -> alpha) for the flavour ('e', 'mu' or 'tau') with
+    the sterile state mixing in through the (alpha, 4) rotation only. dm41 and sin2_2theta
+    may be arrays; the result has shape dm41.shape + sin2_2theta.shape + E.shape.'''
+    a = FLAVOURS[flavour]
+    pair = STERILE_ANGLES[flavour]
+    dm41, sin2_2theta, E = np.atleast_1d(dm41), np.atleast_1d(sin2_2theta), np.atleast_1d(E)
+
+    # Mixing matrices depend only on the angle, so one per sin^2(2 theta) point
+    U = np.stack([three_plus_n_mixing({pair: 0.5 * np.arcsin(np.sqrt(s))}) for s in sin2_2theta.ravel()])
+    U = U.reshape(sin2_2theta.shape + (4, 4))
+
+    result = np.empty(dm41.shape + sin2_2theta.shape + E.shape)
+    for index, dm2 in np.ndenumerate(dm41):
+        masses_squared = three_plus_n_masses_squared(dm2)
+        S = evolution_operators(U[..., None, :, :], masses_squared, L, E)
+        result[index] = np.abs(S[..., a, a])**2
+    return result
+
+
+def mock_sterile_data(flavour, L, E, unoscillated, dm41 = 0.0, sin2_2theta = 0.0, seed = None):
+    '''Poisson-fluctuated event counts per energy bin for a 3+1 hypothesis, starting from the
+    expected unoscillated counts. The default parameters give three-flavour-only data.'''
+    rng = np.random.default_rng(seed)
+    expected = np.asarray(unoscillated) * sterile_survival_probability(flavour, L, E, dm41, sin2_2theta)[0, 0]
+    return rng.poisson(expected)
+
+
+def _chi2_row(flavour, L, E, unoscillated, observed, dm41, sin2_2theta):
+    expected = np.asarray(unoscillated) * sterile_survival_probability(flavour, L, E, dm41, sin2_2theta)[0]
+    return np.sum((observed - expected)**2 / np.maximum(expected, 1e-12), axis = -1)
+
+
+def sterile_chi2_scan(flavour, L, E, unoscillated, observed, dm41_grid, sin2_2theta_grid, processes = SCAN_WORKERS):
+    '''Pearson chi^2 of observed counts against the 3+1 expectation over the grid of
+    Delta m^2_41 [eV^2] x sin^2(2 theta). Rows of the grid (one Delta m^2_41 each) are spread
+    over a process pool in batches; processes = 1, or a single core, runs in this process.
+    Returns an array of shape (len(dm41_grid), len(sin2_2theta_grid)).'''
+    dm41_grid, sin2_2theta_grid = np.ravel(dm41_grid), np.ravel(sin2_2theta_grid)
+    row = partial(_chi2_row, flavour, L, E, unoscillated, np.asarray(observed, dtype = float),
+                  sin2_2theta = sin2_2theta_grid)
+
+    workers = processes or os.cpu_count() or 1
+    if workers == 1:
+        return np.array([row(dm2) for dm2 in dm41_grid])
+
+    # A single row is cheap, so hand each worker a handful of rows at a time
+    chunksize = math.ceil(len(dm41_grid) / (4 * workers))
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        return np.array(list(pool.map(row, dm41_grid, chunksize = chunksize)))
@@ -0,0 +1,278 @@
+import asyncio
+import inspect
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8136
+STREAM_CHUNK = 64 * 1024
+
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'pdf': 'application/pdf',
+}
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class BadRequest(ValueError):
+    '''A request parameter is missing or malformed. The server answers these with a 400,
+    anything else that goes wrong while answering a request is a 500.'''
+
+
+def plot_classes():
+    '''The plots the server knows how to render, by class name.'''
+    from .lobster import LobsterPlot
+    from .orderings import OrderingPlot
+    from .fission_yields import FissionYieldPlot
+    from .isobars import IsobarsPlot
+    return {cls.__name__: cls for cls in (LobsterPlot, OrderingPlot, FissionYieldPlot, IsobarsPlot)}
+
+
+def warm_up():
+    '''Pulls the PDG constants, the PMNS matrix, the constraints and the data tables into
+    memory so that no request pays for them. Run once in the server and once per worker.'''
+    from . import lobster
+    from .constants import pmns
+    from .fission_yields import get_fission_yields
+    from .isobars import get_isobars
+
+    pmns()
+    if not lobster.CONSTRAINTS:
+        lobster.load_constraints_from_yaml(lobster.PATH_TO_CONSTRAINTS)
+    get_fission_yields()
+    get_isobars()
+
+
+def _init_render_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+    warm_up()
+
+
+def render_plot(name, fmt, kwargs):
+    '''Renders a plot to bytes inside a worker process. Goes through the render cache, so
+    repeated requests (even across server restarts) don't rebuild the figure.'''
+    from .cache import get_render_cache
+
+    fd, filename = tempfile.mkstemp(suffix = '.' + fmt)
+    os.close(fd)
+    try:
+        get_render_cache().save(plot_classes()[name], filename, **kwargs)
+        with open(filename, 'rb') as f:
+            return f.read()
+    finally:
+        os.unlink(filename)
+
+
+# --- JSON endpoints --------------------------------------------------------
+
+def _floats(params, name, default = None):
+    '''A comma separated list of numbers from the query string, as an array.'''
+    if name not in params:
+        if default is None:
+            raise BadRequest(f'missing parameter: {name}')
+        return np.atleast_1d(np.asarray(default, dtype = float))
+    try:
+        return np.array([float(v) for v in params[name].split(',')])
+    except ValueError:
+        raise BadRequest(f'{name} must be a comma separated list of numbers, not {params[name]!r}') from None
+
+def _choice(params, name, options, default):
+    '''A query string value that must be one of options.'''
+    value = params.get(name, default)
+    if value not in options:
+        raise BadRequest(f'{name} must be one of {", ".join(options)}, not {value!r}')
+    return value
+
+def _flag(params, name):
+    return params.get(name, '0').lower() in ('1', 'true', 'yes')
+
+
+def api_eff_majorana_mass(params):
+    from .lobster import eff_majorana_mass
+    mmin = _floats(params, 'mmin')
+    pa, pb = _floats(params, 'pa', 0), _floats(params, 'pb', 0)
+    return {'mmin': mmin, 'eff_majorana_mass': eff_majorana_mass(mmin, pa, pb, _flag(params, 'inverted'))}
+
+def api_majorana_mass_bounds(params):
+    from .lobster import majorana_mass_bounds
+    mmin = _floats(params, 'mmin')
+    low, high = majorana_mass_bounds(mmin, _flag(params, 'inverted'))
+    return {'mmin': mmin, 'min': low, 'max': high}
+
+def api_invert(params):
+    '''Lightest and maximum effective Majorana mass allowed by a cosmological (mass_sum)
+    or beta decay (nu_e_mass) limit.'''
+    from . import lobster
+    inversions = {
+        'mass_sum': (lobster.mass_sum_to_lightest, lobster.mass_sum_to_majorana),
+        'nu_e_mass': (lobster.nu_e_mass_to_lightest, lobster.nu_e_mass_to_majorana),
+    }
+    to_lightest, to_majorana = inversions[_choice(params, 'constraint', inversions, 'mass_sum')]
+    value = float(_floats(params, 'value')[0])
+    inverted = _flag(params, 'inverted')
+    return {'lightest': to_lightest(value, inverted), 'majorana': to_majorana(value, inverted)}
+
+def api_oscillation_probability(params):
+    from .oscillations import oscillation_probability, FLAVOURS
+    L, E = _floats(params, 'L'), _floats(params, 'E')
+    alpha, beta = _choice(params, 'alpha', FLAVOURS, 'mu'), _choice(params, 'beta', FLAVOURS, 'e')
+    prob = oscillation_probability(alpha, beta, L, E, float(_floats(params, 'mmin', 0)[0]), _flag(params, 'inverted'))
+    return {'L': L, 'E': E, 'probability': prob}
+
+ENDPOINTS = {
+    'eff_majorana_mass': api_eff_majorana_mass,
+    'majorana_mass_bounds': api_majorana_mass_bounds,
+    'invert': api_invert,
+    'oscillation_probability': api_oscillation_probability,
+}
+
+
+def _to_json(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f'cannot serialize {type(obj).__name__}')
+
+
+class RRNDBDServer:
+    '''An asyncio HTTP front end that keeps the constants and data tables warm, answers
+    JSON computations in a thread and hands plot rendering off to a process pool.
+    Identical requests that arrive while one is in flight share its result.'''
+
+    def __init__(self, host = DEFAULT_HOST, port = DEFAULT_PORT, workers = None):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.pool = None
+        self.inflight = {}
+        self.coalesced = 0
+
+    async def coalesce(self, key, make_future):
+        '''Awaits the in-flight future for key if there is one, otherwise starts a new one.'''
+        if key in self.inflight:
+            self.coalesced += 1
+            return await asyncio.shield(self.inflight[key])
+
+        future = asyncio.ensure_future(make_future())
+        self.inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self.inflight.pop(key, None)
+
+    async def dispatch(self, path, params):
+        '''Returns (status, content type, body bytes) for a request.'''
+        loop = asyncio.get_running_loop()
+        parts = [p for p in path.split('/') if p]
+        key = (path, tuple(sorted(params.items())))
+
+        if parts == ['health']:
+            body = {'inflight': len(self.inflight), 'coalesced': self.coalesced, 'plots': sorted(plot_classes())}
+            return 200, 'application/json', json.dumps(body).encode()
+
+        if len(parts) == 1 and parts[0] in ENDPOINTS:
+            result = await self.coalesce(key, lambda: loop.run_in_executor(None, ENDPOINTS[parts[0]], params))
+            return 200, 'application/json', json.dumps(result, default = _to_json).encode()
+
+        if len(parts) == 2 and parts[0] == 'render':
+            name, _, fmt = parts[1].partition('.')
+            if name not in plot_classes() or fmt not in CONTENT_TYPES:
+                return 404, 'application/json', json.dumps({'error': f'unknown plot: {parts[1]}'}).encode()
+            kwargs = {k: _parse_value(v) for k, v in params.items()}
+            check_plot_kwargs(plot_classes()[name], kwargs)
+            body = await self.coalesce(key, lambda: loop.run_in_executor(self.pool, render_plot, name, fmt, kwargs))
+            return 200, CONTENT_TYPES[fmt], body
+
+        return 404, 'application/json', json.dumps({'error': f'unknown path: {path}'}).encode()
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            # Skip the headers, nothing here needs them
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+
+            if len(request_line) < 2:
+                return
+            if request_line[0] != 'GET':
+                status, ctype, body = 405, 'application/json', json.dumps({'error': 'only GET is supported'}).encode()
+            else:
+                url = urlsplit(request_line[1])
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                try:
+                    status, ctype, body = await self.dispatch(url.path, params)
+                except BadRequest as e:
+                    status, ctype, body = 400, 'application/json', json.dumps({'error': str(e)}).encode()
+                except Exception as e:
+                    status, ctype, body = 500, 'application/json', json.dumps({'error': repr(e)}).encode()
+
+            writer.write((f'HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n'
+                          f'Content-Type: {ctype}\r\n'
+                          f'Content-Length: {len(body)}\r\n'
+                          f'Connection: close\r\n\r\n').encode())
+            for start in range(0, len(body), STREAM_CHUNK):
+                writer.write(body[start:start + STREAM_CHUNK])
+                await writer.drain()
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self):
+        warm_up()
+        self.pool = ProcessPoolExecutor(max_workers = self.workers, initializer = _init_render_worker)
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(f'rrndbd serving on http://{self.host}:{self.port}')
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.pool.shutdown(cancel_futures = True)
+
+
+def check_plot_kwargs(plot_cls, kwargs):
+    '''Raises BadRequest for arguments the plot doesn't name. Plots
+    that pass **kwargs through to BasePlot also accept BasePlot's own arguments.'''
+    from .base import BasePlot
+
+    allowed = set()
+    for cls in (plot_cls, BasePlot):
+        params = inspect.signature(cls.__init__).parameters
+        allowed |= {n for n, p in params.items() if n != 'self' and p.kind in (p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY)}
+        if not any(p.kind == p.VAR_KEYWORD for p in params.values()):
+            break
+
+    unknown = sorted(set(kwargs) - allowed)
+    if unknown:
+        raise BadRequest(f'{plot_cls.__name__} does not take: {", ".join(unknown)}')
+
+
+def _parse_value(value):
+    '''Query string values are JSON if they parse as JSON (numbers, true/false, lists),
+    otherwise plain strings. Lists of numbers become float arrays, which is what the plots
+    do arithmetic on.'''
+    try:
+        value = json.loads(value)
+    except ValueError:
+        return value
+    if isinstance(value, list) and value and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value):
+        return np.asarray(value, dtype = float)
+    return value
+
+
+def serve(host = DEFAULT_HOST, port = DEFAULT_PORT, workers = None):
+    '''Runs the rrndbd server until interrupted.'''
+    try:
+        asyncio.run(RRNDBDServer(host, port, workers).serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,180 @@
+import numpy as np
+
+from .lobster import DSM21, DSM32, SST12, SST13, DCP
+
+CHUNK_SIZE = 2**20  # points per chunk, ~8 MB per float64 array
+
+
+def grid_size(mmin, pa = (0.0,), pb = (0.0,)):
+    '''Number of points in the mmin x pa x pb grid that the iterators below walk through.'''
+    return np.size(mmin) * np.size(pa) * np.size(pb)
+
+
+def iter_grid(mmin, pa = (0.0,), pb = (0.0,), chunk_size : int = CHUNK_SIZE):
+    '''Walks the outer product of mmin, pa and pb in C order (mmin slowest) and yields
+    (slice, mmin, pa, pb) for one chunk at a time. Only the chunk is ever materialized.'''
+    mmin, pa, pb = np.ravel(mmin), np.ravel(pa), np.ravel(pb)
+    shape = (mmin.size, pa.size, pb.size)
+    total = grid_size(mmin, pa, pb)
+
+    for start in range(0, total, chunk_size):
+        stop = min(start + chunk_size, total)
+        i, j, k = np.unravel_index(np.arange(start, stop), shape)
+        yield slice(start, stop), mmin[i], pa[j], pb[k]
+
+
+def chunk_neutrino_masses(mmin, inverted = False):
+    '''Real-valued version of lobster.neutrino_masses for one chunk, without the complex
+    temporaries (unphysical negative squares are clipped to zero, which is what .real gave).'''
+    mmin = np.asarray(mmin, dtype = float)
+    if not inverted:
+        m1 = mmin
+        m2 = np.sqrt(np.maximum(mmin**2 + DSM21[0], 0))
+        m3 = np.sqrt(np.maximum(m2**2 + abs(DSM32[0]), 0))
+    else:
+        m3 = mmin
+        m2 = np.sqrt(np.maximum(m3**2 + abs(DSM32[0]), 0))
+        m1 = np.sqrt(np.maximum(m2**2 - DSM21[0], 0))
+    return m1, m2, m3
+
+
+def chunk_majorana_terms(mmin, inverted = False):
+    '''The three terms |U_ei|^2 m_i whose phased sum is the effective Majorana mass.'''
+    m1, m2, m3 = chunk_neutrino_masses(mmin, inverted)
+    return (1 - SST12[0])*(1 - SST13[0])*m1, SST12[0]*(1 - SST13[0])*m2, SST13[0]*m3
+
+
+def chunk_eff_majorana_mass(mmin, pa, pb, inverted = False):
+    '''lobster.eff_majorana_mass for one chunk, with the phases handled as cos/sin pairs.'''
+    t1, t2, t3 = chunk_majorana_terms(mmin, inverted)
+    return np.hypot(t1 + t2*np.cos(pa) + t3*np.cos(pb), t2*np.sin(pa) + t3*np.sin(pb))
+
+
+def chunk_electron_neutrino_mass(mmin, inverted = False):
+    '''lobster.electron_neutrino_mass for one chunk.'''
+    m1, m2, m3 = chunk_neutrino_masses(mmin, inverted)
+    t12 = np.sqrt((1 - SST12[0])*(1 - SST13[0]))*m1 + np.sqrt(SST12[0]*(1 - SST13[0]))*m2
+    t3 = np.sqrt(SST13[0])*m3
+    return np.hypot(t12 + t3*np.cos(DCP[0]), t3*np.sin(DCP[0]))
+
+
+def chunk_nu_mass_sum(mmin, inverted = False):
+    '''lobster.nu_mass_sum for one chunk.'''
+    m1, m2, m3 = chunk_neutrino_masses(mmin, inverted)
+    return m1 + m2 + m3
+
+
+def iter_neutrino_masses(mmin, inverted = False, chunk_size : int = CHUNK_SIZE):
+    '''Yields (slice, (m1, m2, m3)) over mmin in chunks.'''
+    for where, m, _, _ in iter_grid(mmin, chunk_size = chunk_size):
+        yield where, chunk_neutrino_masses(m, inverted)
+
+def iter_eff_majorana_mass(mmin, pa, pb, inverted = False, chunk_size : int = CHUNK_SIZE):
+    '''Yields (slice, m_bb) over the flattened mmin x pa x pb grid in chunks.'''
+    for where, m, a, b in iter_grid(mmin, pa, pb, chunk_size):
+        yield where, chunk_eff_majorana_mass(m, a, b, inverted)
+
+def iter_electron_neutrino_mass(mmin, inverted = False, chunk_size : int = CHUNK_SIZE):
+    '''Yields (slice, m_beta) over mmin in chunks.'''
+    for where, m, _, _ in iter_grid(mmin, chunk_size = chunk_size):
+        yield where, chunk_electron_neutrino_mass(m, inverted)
+
+def iter_nu_mass_sum(mmin, inverted = False, chunk_size : int = CHUNK_SIZE):
+    '''Yields (slice, sum of masses) over mmin in chunks.'''
+    for where, m, _, _ in iter_grid(mmin, chunk_size = chunk_size):
+        yield where, chunk_nu_mass_sum(m, inverted)
+
+
+def eff_majorana_mass_to(out, mmin, pa, pb, inverted = False, chunk_size : int = CHUNK_SIZE):
+    '''Writes m_bb over the mmin x pa x pb grid into out, chunk by chunk. out is an
+    np.memmap, a plain array or anything else that takes slice assignment, such as an h5py
+    dataset, either flat with grid_size entries or shaped (mmin, pa, pb). Arrays are written
+    through their flat view, so they must be C-contiguous. Other 3-D targets are written in
+    blocks of whole m_lightest rows (or of pa rows when one m_lightest row is more than a
+    chunk), which is what h5py supports.'''
+    if not isinstance(out, np.ndarray) and getattr(out, 'ndim', 1) == 3:
+        _write_blocks(out, mmin, pa, pb, inverted, chunk_size)
+    else:
+        if isinstance(out, np.ndarray):
+            if not out.flags.c_contiguous:
+                raise ValueError('output array must be C-contiguous, otherwise its flat view is a copy')
+            target = out.reshape(-1)
+        else:
+            target = out
+        if len(target) != grid_size(mmin, pa, pb):
+            raise ValueError(f'output has {len(target)} entries, the grid has {grid_size(mmin, pa, pb)}')
+
+        for where, values in iter_eff_majorana_mass(mmin, pa, pb, inverted, chunk_size):
+            target[where] = values
+
+    if hasattr(out, 'flush'):
+        out.flush()
+    return out
+
+
+def _write_blocks(out, mmin, pa, pb, inverted, chunk_size):
+    '''eff_majorana_mass_to for targets that are only indexed as (mmin, pa, pb).'''
+    mmin, pa, pb = np.ravel(mmin), np.ravel(pa), np.ravel(pb)
+    shape = (mmin.size, pa.size, pb.size)
+    if tuple(out.shape) != shape:
+        raise ValueError(f'output has shape {tuple(out.shape)}, the grid has {shape}')
+    for i, j in _grid_blocks(shape, chunk_size):
+        out[i, j] = chunk_eff_majorana_mass(mmin[i, None, None], pa[None, j, None], pb[None, None, :], inverted)
+
+
+def _grid_blocks(shape, chunk_size):
+    '''Yields (mmin slice, pa slice) blocks that cover the grid with whole pb rows and
+    hold at most chunk_size points, unless a single pb row is already larger.'''
+    n_m, n_a, n_b = shape
+    if n_a * n_b <= chunk_size:
+        step = chunk_size // (n_a * n_b)
+        for i in range(0, n_m, step):
+            yield slice(i, min(i + step, n_m)), slice(0, n_a)
+    else:
+        step = max(1, chunk_size // n_b)
+        for i in range(n_m):
+            for j in range(0, n_a, step):
+                yield slice(i, i + 1), slice(j, min(j + step, n_a))
+
+
+def eff_majorana_mass_memmap(filename, mmin, pa, pb, inverted = False, chunk_size : int = CHUNK_SIZE):
+    '''Computes m_bb over the grid straight into a new .npy file of shape (mmin, pa, pb) and
+    returns it memory-mapped.'''
+    shape = (np.size(mmin), np.size(pa), np.size(pb))
+    out = np.lib.format.open_memmap(filename, mode = 'w+', dtype = np.float64, shape = shape)
+    return eff_majorana_mass_to(out, mmin, pa, pb, inverted, chunk_size)
+
+
+def majorana_mass_reductions(mmin, pa, pb, inverted = False, bins = None, chunk_size : int = CHUNK_SIZE):
+    '''Single streaming pass over the mmin x pa x pb grid that reduces over the phases for
+    every m_lightest value: the min and max of m_bb and, if bins (histogram edges in eV) are
+    given, a histogram of m_bb. Memory goes with len(mmin) x len(bins), not with the grid.'''
+    mmin = np.ravel(mmin)
+    n_phases = np.size(pa) * np.size(pb)
+
+    low = np.full(mmin.size, np.inf)
+    high = np.full(mmin.size, -np.inf)
+    hist = None if bins is None else np.zeros((mmin.size, len(bins) - 1), dtype = np.int64)
+
+    for where, values in iter_eff_majorana_mass(mmin, pa, pb, inverted, chunk_size):
+        # Grid points are in C order, so each chunk covers a run of consecutive m_lightest rows
+        row = np.arange(where.start, where.stop) // n_phases
+        first = row[0]
+        starts = np.flatnonzero(np.diff(row, prepend = first - 1))
+        rows = row[starts]
+        low[rows] = np.minimum(low[rows], np.minimum.reduceat(values, starts))
+        high[rows] = np.maximum(high[rows], np.maximum.reduceat(values, starts))
+
+        if hist is not None:
+            n_bins = len(bins) - 1
+            col = np.searchsorted(bins, values, side = 'right') - 1
+            col[values == bins[-1]] = n_bins - 1  # last bin is closed, as in np.histogram
+            inside = (col >= 0) & (col < n_bins)
+            counts = np.bincount((row[inside] - first) * n_bins + col[inside], minlength = (row[-1] - first + 1) * n_bins)
+            hist[first:row[-1] + 1] += counts.reshape(-1, n_bins)
+
+    result = {'mmin': mmin, 'min': low, 'max': high}
+    if hist is not None:
+        result['bins'] = np.asarray(bins)
+        result['histogram'] = hist
+    return result
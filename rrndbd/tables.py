@@ -0,0 +1,219 @@
+import fcntl
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from .constants import constants_fingerprint
+from .lobster import majorana_mass_bounds
+from .streaming import chunk_eff_majorana_mass, chunk_majorana_terms
+
+TABLE_DIR = Path.home() / '.cache' / 'rrndbd' / 'tables'
+MMIN_RANGE = (1e-5, 1e0)  # eV
+N_MMIN = 4096
+N_PHASE = 4096
+QUERY_CHUNK = 2**16  # small enough that a chunk's temporaries stay in cache
+TABLE_FORMAT = 3  # bump when the file layout changes, so old tables get rebuilt
+
+# Module-level cache of opened tables, one per (directory, table name)
+_TABLES = {}
+
+
+class MajoranaMassTable:
+    '''Precomputed pieces of the effective Majorana mass, memory-mapped read-only so every
+    process that opens the same table shares its pages instead of holding its own copy: cos
+    and sin of a Majorana phase on a periodic grid, and the min/max m_bb envelopes of the
+    normal (index 0) and inverted (index 1) orderings on a log-spaced m_lightest grid.
+
+    Nearly all the time of the closed form goes into its four trig calls, while the masses
+    only cost a few square roots. interpolate therefore reads e^(i phase) from the phase
+    table, linearly between grid points, and computes the mass terms exactly. Linear
+    interpolation strays from the unit circle by at most h^2/8 for a grid step h, so
+    interpolate is off by at most (t2 + t3) h^2/8, with t2, t3 the m2 and m3 terms of m_bb.
+    error_bound returns that for given masses. With the default 4096 phases it is below
+    1e-7 eV even at m_lightest = 1 eV, and around 1e-9 eV in the normal ordering
+    cancellation region (1e-3 to 1e-2 eV).
+
+    eff_majorana_mass answers the same queries with the exact closed form. Both take any
+    non-negative m_lightest. majorana_mass_bounds clamps masses to the grid: below it the
+    envelopes no longer change, above it they are held at 1 eV. Negative or non-finite
+    inputs raise ValueError.'''
+
+    def __init__(self, directory, meta):
+        self.directory = Path(directory)
+        self.meta = meta
+        self.fingerprint = meta['constants']
+        self.log_mmin = np.linspace(np.log(meta['mmin_range'][0]), np.log(meta['mmin_range'][1]), meta['n_mmin'])
+        self.n_phase = meta['n_phase']
+        self.phase_step = 2 * np.pi / self.n_phase
+
+        # Plain ndarray views of the maps, np.memmap adds overhead to every fancy index
+        self.phases = np.asarray(np.load(self.directory / meta['phase_file'], mmap_mode = 'r'))
+        self.bounds = np.asarray(np.load(self.directory / meta['bounds_file'], mmap_mode = 'r'))
+
+    def eff_majorana_mass(self, mmin, pa, pb, inverted = False, out = None):
+        '''Exact m_bb at arbitrary points, evaluated in chunks so temporaries stay small
+        for 10^7 queries. Arguments broadcast against each other.'''
+        return self._evaluate(chunk_eff_majorana_mass, mmin, pa, pb, inverted, out)
+
+    def interpolate(self, mmin, pa, pb, inverted = False, out = None):
+        '''m_bb with the phase terms read from the table, see the class docstring for its
+        error. Arguments broadcast against each other.'''
+        return self._evaluate(self._interpolate, mmin, pa, pb, inverted, out)
+
+    def majorana_mass_bounds(self, mmin, inverted = False):
+        '''Interpolated counterpart of lobster.majorana_mass_bounds.'''
+        x = np.log(self._clamp(mmin))
+        low, high = self.bounds[int(inverted)]
+        return np.interp(x, self.log_mmin, low), np.interp(x, self.log_mmin, high)
+
+    def error_bound(self, mmin, inverted = False):
+        '''Largest error [eV] interpolate can make at each mass, over all phases.'''
+        _, t2, t3 = chunk_majorana_terms(self._check(mmin), inverted)
+        return (t2 + t3) * self.phase_step**2 / 8
+
+    def _evaluate(self, kernel, mmin, pa, pb, inverted, out):
+        mmin, pa, pb = np.broadcast_arrays(self._check(mmin), np.asarray(pa, dtype = float), np.asarray(pb, dtype = float))
+        if not (np.all(np.isfinite(pa)) and np.all(np.isfinite(pb))):
+            raise ValueError('the Majorana phases must be finite')
+        if out is None:
+            out = np.empty(mmin.shape)
+        elif out.shape != mmin.shape:
+            raise ValueError(f'output has shape {out.shape}, the queries broadcast to {mmin.shape}')
+        elif not out.flags.c_contiguous:
+            raise ValueError('output array must be C-contiguous, otherwise its flat view is a copy')
+
+        flat_m, flat_a, flat_b, flat_out = mmin.ravel(), pa.ravel(), pb.ravel(), out.reshape(-1)
+        for start in range(0, flat_m.size, QUERY_CHUNK):
+            chunk = slice(start, start + QUERY_CHUNK)
+            flat_out[chunk] = kernel(flat_m[chunk], flat_a[chunk], flat_b[chunk], inverted)
+
+        return out
+
+    def _check(self, mmin):
+        mmin = np.asarray(mmin, dtype = float)
+        if not np.all(np.isfinite(mmin)):
+            raise ValueError('the lightest neutrino mass must be finite')
+        if np.any(mmin < 0):
+            raise ValueError('the lightest neutrino mass cannot be negative')
+        return mmin
+
+    def _clamp(self, mmin):
+        return np.clip(self._check(mmin), np.exp(self.log_mmin[0]), np.exp(self.log_mmin[-1]))
+
+    def _interpolate(self, mmin, pa, pb, inverted):
+        t1, t2, t3 = chunk_majorana_terms(mmin, inverted)
+        cos_a, sin_a = self._phase(pa)
+        cos_b, sin_b = self._phase(pb)
+        return np.hypot(t1 + t2*cos_a + t3*cos_b, t2*sin_a + t3*sin_b)
+
+    def _phase(self, phase):
+        '''cos and sin of phase, linear between the grid points, which wrap around.'''
+        cos, sin, dcos, dsin = self.phases
+        y = phase * (1 / self.phase_step)
+        i = np.floor(y)
+        y -= i
+        i = i.astype(np.intp) % self.n_phase
+        return cos[i] + y * dcos[i], sin[i] + y * dsin[i]
+
+
+def generate_mbb_table(directory = TABLE_DIR, n_mmin : int = N_MMIN, n_phase : int = N_PHASE, mmin_range = MMIN_RANGE):
+    '''Tabulates the phase terms and the min/max m_bb envelopes of both orderings, writes
+    them as .npy files stamped with the current constants fingerprint and the grid, and
+    returns the opened table. Tables left over from other constants are deleted. Callers
+    sharing a directory should go through load_mbb_table, which serializes generation.'''
+    directory = Path(directory)
+    directory.mkdir(parents = True, exist_ok = True)
+    fingerprint = constants_fingerprint()
+    name = _table_name(fingerprint, n_mmin, n_phase, mmin_range)
+
+    grid = np.arange(n_phase + 1) * 2 * np.pi / n_phase
+    cos, sin = np.cos(grid), np.sin(grid)
+    phases = np.stack([cos[:-1], sin[:-1], np.diff(cos), np.diff(sin)])
+
+    mmin = np.logspace(np.log10(mmin_range[0]), np.log10(mmin_range[1]), n_mmin)
+    bounds = np.stack([majorana_mass_bounds(mmin, inverted) for inverted in (False, True)])
+
+    meta = {
+        'constants': fingerprint,
+        'mmin_range': list(mmin_range),
+        'n_mmin': n_mmin,
+        'n_phase': n_phase,
+        'phase_file': f'{name}_phases.npy',
+        'bounds_file': f'{name}_bounds.npy',
+    }
+
+    # Write to unique temporary names first so that a reader never maps a half-written table
+    for filename, array in ((meta['phase_file'], phases), (meta['bounds_file'], bounds)):
+        tmp = _temp_file(directory)
+        with open(tmp, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp, directory / filename)
+
+    meta_tmp = _temp_file(directory)
+    with open(meta_tmp, 'w') as f:
+        json.dump(meta, f, indent = 2)
+    os.replace(meta_tmp, _meta_path(directory, name))
+
+    _remove_stale_tables(directory, fingerprint)
+    return MajoranaMassTable(directory, meta)
+
+
+def load_mbb_table(directory = TABLE_DIR, n_mmin : int = N_MMIN, n_phase : int = N_PHASE, mmin_range = MMIN_RANGE):
+    '''Opens the table for the current constants and the given grid, generating it first if
+    it doesn't exist yet. Generation holds an exclusive lock on the directory, so when
+    several processes ask at once only one builds the table and the others wait and then
+    map it. Tables are cached per process; the pages themselves are shared through the
+    memory map.'''
+    directory = Path(directory)
+    fingerprint = constants_fingerprint()
+    name = _table_name(fingerprint, n_mmin, n_phase, mmin_range)
+    key = (str(directory), name)
+
+    if key not in _TABLES:
+        meta_path = _meta_path(directory, name)
+        if not meta_path.exists():
+            directory.mkdir(parents = True, exist_ok = True)
+            with open(directory / f'mbb_{fingerprint}.lock', 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    if not meta_path.exists():
+                        _TABLES[key] = generate_mbb_table(directory, n_mmin, n_phase, mmin_range)
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+        if key not in _TABLES:
+            with open(meta_path, 'r') as f:
+                _TABLES[key] = MajoranaMassTable(directory, json.load(f))
+
+    return _TABLES[key]
+
+
+def _table_name(fingerprint, n_mmin, n_phase, mmin_range):
+    return f'mbb_{fingerprint}_{n_mmin}x{n_phase}_{mmin_range[0]:g}-{mmin_range[1]:g}'
+
+
+def _meta_path(directory, name):
+    return Path(directory) / f'{name}_v{TABLE_FORMAT}.json'
+
+
+def _remove_stale_tables(directory, fingerprint):
+    '''Deletes the table files of other constants fingerprints or older formats. Processes
+    that still have one mapped keep their pages until they close it.'''
+    keep = set()
+    for meta_path in Path(directory).glob(f'mbb_{fingerprint}_*_v{TABLE_FORMAT}.json'):
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        keep |= {meta_path.name, meta['phase_file'], meta['bounds_file']}
+
+    for path in Path(directory).glob('mbb_*'):
+        if path.suffix in ('.npy', '.json') and path.name not in keep:
+            path.unlink(missing_ok = True)
+
+
+def _temp_file(directory):
+    fd, name = tempfile.mkstemp(dir = directory, suffix = '.tmp')
+    os.close(fd)
+    return name
@@ -0,0 +1,98 @@
+# test_cache.py
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pytest
+
+from rrndbd import lobster
+from rrndbd.base import BasePlot
+from rrndbd.cache import RenderCache
+
+
+class DotPlot(BasePlot):
+    '''A cheap plot that counts how many times it gets built.'''
+    built = 0
+
+    def __init__(self, size = 10, **kwargs):
+        super().__init__(**kwargs)
+        DotPlot.built += 1
+        self.ax.scatter([0], [0], s = size)
+
+
+def test_hit_and_miss(tmp_path):
+    cache = RenderCache(tmp_path / 'cache')
+    before = DotPlot.built
+
+    assert not DotPlot.cached_save(tmp_path / 'a.png', cache = cache)
+    assert DotPlot.cached_save(tmp_path / 'b.png', cache = cache)
+    assert (tmp_path / 'a.png').read_bytes() == (tmp_path / 'b.png').read_bytes()
+    assert DotPlot.built == before + 1
+
+    # Different arguments or format are different renders
+    assert not DotPlot.cached_save(tmp_path / 'c.png', size = 20, cache = cache)
+    assert not DotPlot.cached_save(tmp_path / 'd.svg', cache = cache)
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 3, 3)
+    assert stats['bytes'] == cache.size() > 0
+
+
+def test_shared_between_instances(tmp_path):
+    first = RenderCache(tmp_path / 'cache')
+    second = RenderCache(tmp_path / 'cache')
+    DotPlot.cached_save(tmp_path / 'a.png', size = 5, cache = first)
+    assert DotPlot.cached_save(tmp_path / 'b.png', size = 5, cache = second)
+    assert second.stats()['entries'] == 1
+
+
+def test_lru_eviction(tmp_path):
+    cache = RenderCache(tmp_path / 'cache')
+    for size in (1, 2, 3):
+        DotPlot.cached_save(tmp_path / 'out.png', size = size, cache = cache)
+    one_render = max(size for _, size, _ in cache.entries())
+
+    # Touch size = 1 so that size = 2 is the least recently used, then shrink the cache
+    assert DotPlot.cached_save(tmp_path / 'out.png', size = 1, cache = cache)
+    cache.max_bytes = 2 * one_render
+    DotPlot.cached_save(tmp_path / 'out.png', size = 4, cache = cache)
+
+    assert cache.size() <= cache.max_bytes
+    assert cache.evictions == 2
+    assert DotPlot.cached_save(tmp_path / 'out.png', size = 4, cache = cache)
+    assert not DotPlot.cached_save(tmp_path / 'out.png', size = 2, cache = cache)
+
+
+def test_key_follows_loaded_constraints(tmp_path):
+    cache = RenderCache(tmp_path / 'cache')
+    key = cache.key(DotPlot, 'png')
+    label = lobster.CONSTRAINTS['cosmology']['ACT_DR6_2025']['label']
+    try:
+        lobster.CONSTRAINTS['cosmology']['ACT_DR6_2025']['label'] = 'changed'
+        assert cache.key(DotPlot, 'png') != key
+    finally:
+        lobster.CONSTRAINTS['cosmology']['ACT_DR6_2025']['label'] = label
+    assert cache.key(DotPlot, 'png') == key
+
+
+def test_key_normalizes_arguments(tmp_path):
+    cache = RenderCache(tmp_path / 'cache')
+    key = cache.key(DotPlot, 'png')
+    assert cache.key(DotPlot, 'png', (10,)) == key
+    assert cache.key(DotPlot, 'png', kwargs = {'size': 10.0}) == key
+    assert cache.key(DotPlot, 'png', kwargs = {'size': np.float64(10), 'figsize': [6, 4]}) == key
+    assert cache.key(DotPlot, 'png', kwargs = {'size': 11}) != key
+
+    lobster_key = cache.key(lobster.LobsterPlot, 'png')
+    assert cache.key(lobster.LobsterPlot, 'png', kwargs = {'min_masses': np.logspace(-4, 0, 100)}) == lobster_key
+
+
+def test_unwritable_destination_keeps_render(tmp_path):
+    cache = RenderCache(tmp_path / 'cache')
+    before = DotPlot.built
+    for _ in range(2):
+        with pytest.raises(FileNotFoundError):
+            DotPlot.cached_save(tmp_path / 'missing' / 'a.png', size = 7, cache = cache)
+
+    stats = cache.stats()
+    assert DotPlot.built == before + 1
+    assert (stats['hits'], stats['misses'], stats['entries']) == (0, 1, 1)
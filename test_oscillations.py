@@ -0,0 +1,66 @@
+# test_oscillations.py
+import numpy as np
+import pytest
+
+from rrndbd import oscillations as osc
+from rrndbd.constants import pmns
+from rrndbd.lobster import neutrino_masses
+
+
+def test_three_flavour_mixing_is_pmns():
+    assert np.allclose(osc.three_plus_n_mixing(n_sterile = 0), pmns(), rtol = 0, atol = 1e-15)
+
+
+@pytest.mark.parametrize('n', [2, 3, 4, 5, 6])
+def test_mixing_is_unitary(n):
+    rng = np.random.default_rng(n)
+    pairs = osc.rotation_order(n)
+    angles = dict(zip(pairs, rng.uniform(0, np.pi / 2, len(pairs))))
+    phases = dict(zip(pairs, rng.uniform(0, 2 * np.pi, len(pairs))))
+    U = osc.mixing_matrix(n, angles, phases)
+    assert np.allclose(U @ U.conj().T, np.eye(n), atol = 1e-14)
+    assert np.allclose(U.conj().T @ U, np.eye(n), atol = 1e-14)
+    assert not U.flags.writeable
+
+
+def test_vacuum_matches_three_flavour_formula():
+    masses_squared = np.array(neutrino_masses(0))**2
+    E = np.linspace(0.5, 3, 7)
+    P = osc.transition_probabilities(pmns(), masses_squared, 1300, E)
+    assert np.allclose(P[:, 1, 0], osc.oscillation_probability('mu', 'e', 1300, E), atol = 1e-14)
+    assert np.allclose(P.sum(axis = -1), 1) and np.allclose(P.sum(axis = -2), 1)
+    # The eigendecomposition path agrees with the vacuum shortcut as the density goes to zero
+    assert np.allclose(osc.transition_probabilities(pmns(), masses_squared, 1300, E, density = 1e-12), P, atol = 1e-9)
+
+
+@pytest.mark.parametrize('antineutrino', [False, True])
+def test_two_flavour_matter_matches_msw(antineutrino):
+    theta, dm2, L, density = 0.3, 2.5e-3, 1300, 3.0
+    E = np.linspace(0.5, 5, 10)
+    P = osc.transition_probabilities(osc.mixing_matrix(2, {(1, 2): theta}), [0, dm2], L, E, density, antineutrino)
+
+    A = osc.MATTER_FACTOR * density * E * (-1 if antineutrino else 1)
+    scale = np.sqrt((np.cos(2 * theta) - A / dm2)**2 + np.sin(2 * theta)**2)
+    expected = (np.sin(2 * theta) / scale)**2 * np.sin(osc.PHASE_FACTOR / 2 * dm2 * scale * L / E)**2
+    assert np.allclose(P[:, 0, 1], expected, atol = 1e-12)
+
+
+def test_sterile_survival_short_baseline():
+    L, E = 0.01, np.linspace(0.002, 0.008, 20)
+    P = osc.sterile_survival_probability('e', L, E, 1.0, 0.1)[0, 0]
+    approx = osc.oscillation_probability('e', 'e', L, E) - 0.1 * np.sin(osc.PHASE_FACTOR / 2 * L / E)**2
+    assert np.allclose(P, approx, atol = 1e-4)
+
+
+def test_chi2_scan_finds_truth_in_parallel():
+    L, E = 0.01, np.linspace(0.002, 0.008, 30)
+    unoscillated = np.full(E.size, 1e6)
+    observed = osc.mock_sterile_data('e', L, E, unoscillated, dm41 = 1.0, sin2_2theta = 0.1, seed = 1)
+    dm41, sin2 = np.logspace(-1, 1, 21), np.logspace(-2, 0, 21)
+
+    parallel = osc.sterile_chi2_scan('e', L, E, unoscillated, observed, dm41, sin2, processes = 2)
+    serial = osc.sterile_chi2_scan('e', L, E, unoscillated, observed, dm41, sin2, processes = 1)
+    assert np.allclose(parallel, serial)
+
+    i, j = np.unravel_index(np.argmin(serial), serial.shape)
+    assert np.isclose(dm41[i], 1.0) and np.isclose(sin2[j], 0.1)
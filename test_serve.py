@@ -0,0 +1,119 @@
+# test_serve.py
+import asyncio
+import json
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pytest
+
+from rrndbd import cache, lobster
+from rrndbd import serve
+from rrndbd.serve import RRNDBDServer, BadRequest
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    # Renders go through a thread instead of the process pool, into a throwaway cache
+    monkeypatch.setattr(cache, '_RENDER_CACHE', cache.RenderCache(tmp_path / 'renders'))
+    return RRNDBDServer()
+
+
+def request(server, path, **params):
+    status, ctype, body = asyncio.run(server.dispatch(path, {k: str(v) for k, v in params.items()}))
+    return status, ctype, (json.loads(body) if ctype == 'application/json' else body)
+
+
+def test_eff_majorana_mass(server):
+    status, _, body = request(server, '/eff_majorana_mass', mmin = '0.001,0.01', pa = 0, pb = 3, inverted = 1)
+    assert status == 200
+    assert np.allclose(body['eff_majorana_mass'], lobster.eff_majorana_mass(np.array([0.001, 0.01]), 0, 3, True))
+
+
+def test_majorana_mass_bounds(server):
+    status, _, body = request(server, '/majorana_mass_bounds', mmin = '0.001,0.005,0.01')
+    low, high = lobster.majorana_mass_bounds(np.array([0.001, 0.005, 0.01]))
+    assert status == 200
+    assert np.allclose(body['min'], low) and np.allclose(body['max'], high)
+
+
+def test_invert(server):
+    status, _, body = request(server, '/invert', constraint = 'mass_sum', value = 0.12)
+    assert status == 200
+    assert np.isclose(body['lightest'], lobster.mass_sum_to_lightest(0.12))
+
+
+def test_oscillation_probability(server):
+    status, _, body = request(server, '/oscillation_probability', alpha = 'mu', beta = 'mu', L = 295, E = '0.6,1')
+    assert status == 200
+    assert len(body['probability']) == 2
+    assert all(0 <= p <= 1 for p in body['probability'])
+
+    from rrndbd.oscillations import oscillation_probability
+    status, _, body = request(server, '/oscillation_probability', alpha = 'mu', beta = 'e', L = 295, E = 0.6, mmin = 0.01, inverted = 1)
+    assert status == 200
+    assert np.allclose(body['probability'], oscillation_probability('mu', 'e', [295], [0.6], 0.01, True))
+
+
+def test_render(server):
+    status, ctype, body = request(server, '/render/OrderingPlot.svg', squared = 'true')
+    assert status == 200 and ctype == 'image/svg+xml'
+    assert b'<svg' in body
+
+    status, ctype, body = request(server, '/render/LobsterPlot.png', min_masses = '[0.001,0.01,0.1]')
+    assert status == 200 and body.startswith(b'\x89PNG')
+
+
+def test_errors(server):
+    assert request(server, '/nope')[0] == 404
+    assert request(server, '/render/NoSuchPlot.png')[0] == 404
+    with pytest.raises(BadRequest):
+        request(server, '/eff_majorana_mass')
+    with pytest.raises(BadRequest):
+        request(server, '/eff_majorana_mass', mmin = 'abc')
+    with pytest.raises(BadRequest):
+        request(server, '/oscillation_probability', alpha = 'x', L = 1, E = 1)
+    with pytest.raises(BadRequest):
+        request(server, '/render/LobsterPlot.png', bogus = 1)
+
+
+def test_identical_requests_coalesce(server):
+    async def burst():
+        params = {'mmin': '0.001,0.002,0.003'}
+        return await asyncio.gather(*(server.dispatch('/eff_majorana_mass', dict(params)) for _ in range(5)))
+
+    results = asyncio.run(burst())
+    assert server.coalesced == 4
+    assert len({body for _, _, body in results}) == 1
+    assert not server.inflight
+
+
+def test_status_codes_over_http(server, monkeypatch):
+    def broken(params):
+        raise TypeError('a bug, not the client\'s fault')
+    monkeypatch.setitem(serve.ENDPOINTS, 'broken', broken)
+
+    async def get(port, target):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f'GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), json.loads(body)
+
+    async def run():
+        http = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+        port = http.sockets[0].getsockname()[1]
+        async with http:
+            return [await get(port, target) for target in (
+                '/oscillation_probability?alpha=mu&beta=e&L=295&E=0.6&mmin=0.01',
+                '/eff_majorana_mass?mmin=abc',
+                '/render/LobsterPlot.png?bogus=1',
+                '/nope',
+                '/broken',
+            )]
+
+    (ok, body), *errors = asyncio.run(run())
+    assert ok == 200 and len(body['probability']) == 1
+    assert [status for status, _ in errors] == [400, 400, 404, 500]
@@ -0,0 +1,89 @@
+# test_streaming.py
+import numpy as np
+import pytest
+
+from rrndbd import lobster, streaming
+
+MMIN = np.logspace(-4, 0, 37)
+PA = np.linspace(0, 2 * np.pi, 11)
+PB = np.linspace(0, 2 * np.pi, 7)
+CHUNK = 50  # doesn't divide the 77 phase points per m_lightest
+
+
+def full_grid(inverted):
+    return lobster.eff_majorana_mass(MMIN[:, None, None], PA[None, :, None], PB[None, None, :], inverted)
+
+
+@pytest.mark.parametrize('inverted', [False, True])
+def test_chunk_kernels_match_lobster(inverted):
+    for mine, theirs in zip(streaming.chunk_neutrino_masses(MMIN, inverted), lobster.neutrino_masses(MMIN, inverted)):
+        assert np.allclose(mine, theirs, rtol = 1e-12, atol = 0)
+    assert np.allclose(streaming.chunk_electron_neutrino_mass(MMIN, inverted), lobster.electron_neutrino_mass(MMIN, inverted), rtol = 1e-12)
+    assert np.allclose(streaming.chunk_nu_mass_sum(MMIN, inverted), lobster.nu_mass_sum(MMIN, inverted), rtol = 1e-12)
+
+
+@pytest.mark.parametrize('inverted', [False, True])
+def test_iterators_cover_grid(inverted):
+    out = np.full(streaming.grid_size(MMIN, PA, PB), np.nan)
+    for where, values in streaming.iter_eff_majorana_mass(MMIN, PA, PB, inverted, chunk_size = CHUNK):
+        assert len(values) <= CHUNK
+        out[where] = values
+    assert np.allclose(out.reshape(full_grid(inverted).shape), full_grid(inverted), rtol = 1e-12, atol = 1e-18)
+
+    sums = np.concatenate([v for _, v in streaming.iter_nu_mass_sum(MMIN, inverted, chunk_size = 5)])
+    assert np.allclose(sums, lobster.nu_mass_sum(MMIN, inverted))
+
+
+def test_write_to_memmap(tmp_path):
+    out = streaming.eff_majorana_mass_memmap(tmp_path / 'mbb.npy', MMIN, PA, PB, True, chunk_size = CHUNK)
+    assert isinstance(out, np.memmap)
+    assert np.allclose(np.load(tmp_path / 'mbb.npy'), full_grid(True), rtol = 1e-12)
+
+
+class Dataset:
+    '''Stands in for an h5py dataset: only (mmin, pa, pb) indexing, no flat view.'''
+    def __init__(self, shape):
+        self.shape, self.ndim = shape, len(shape)
+        self.data = np.full(shape, np.nan)
+        self.writes = 0
+
+    def __setitem__(self, key, values):
+        assert isinstance(key, tuple) and len(key) == 2
+        self.data[key] = values
+        self.writes += 1
+
+
+@pytest.mark.parametrize('chunk_size', [CHUNK, 200, 3])
+def test_write_to_3d_dataset(chunk_size):
+    out = streaming.eff_majorana_mass_to(Dataset((37, 11, 7)), MMIN, PA, PB, True, chunk_size = chunk_size)
+    assert np.allclose(out.data, full_grid(True), rtol = 1e-12)
+    assert out.writes == {CHUNK: 37 * 2, 200: 19, 3: 37 * 11}[chunk_size]
+    with pytest.raises(ValueError):
+        streaming.eff_majorana_mass_to(Dataset((37, 7, 11)), MMIN, PA, PB)
+
+
+def test_rejects_bad_outputs():
+    with pytest.raises(ValueError):
+        streaming.eff_majorana_mass_to(np.zeros((37, 11, 7), order = 'F'), MMIN, PA, PB)
+    with pytest.raises(ValueError):
+        streaming.eff_majorana_mass_to(np.zeros(10), MMIN, PA, PB)
+
+
+@pytest.mark.parametrize('inverted', [False, True])
+def test_reductions(inverted):
+    bins = np.logspace(-5, 0, 21)
+    grid = full_grid(inverted)
+    result = streaming.majorana_mass_reductions(MMIN, PA, PB, inverted, bins = bins, chunk_size = CHUNK)
+
+    assert np.allclose(result['min'], grid.min(axis = (1, 2)), rtol = 1e-12, atol = 1e-18)
+    assert np.allclose(result['max'], grid.max(axis = (1, 2)), rtol = 1e-12)
+    expected = np.array([np.histogram(row, bins)[0] for row in grid.reshape(len(MMIN), -1)])
+    assert np.array_equal(result['histogram'], expected)
+
+
+def test_histogram_edges_match_numpy():
+    # m_bb at zero phases and m_lightest = 1e-4 lands exactly on both outer edges
+    value = streaming.chunk_eff_majorana_mass(np.array([1e-4]), 0.0, 0.0)[0]
+    bins = np.array([value / 2, value])
+    result = streaming.majorana_mass_reductions([1e-4], [0.0], [0.0], bins = bins)
+    assert np.array_equal(result['histogram'][0], np.histogram([value], bins)[0])
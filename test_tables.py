@@ -0,0 +1,126 @@
+# test_tables.py
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from rrndbd import tables
+from rrndbd.lobster import eff_majorana_mass, majorana_mass_bounds
+
+
+@pytest.fixture(scope = 'module')
+def table(tmp_path_factory):
+    return tables.load_mbb_table(tmp_path_factory.mktemp('tables'))
+
+
+def random_points(n, seed = 1):
+    rng = np.random.default_rng(seed)
+    mmin = np.exp(rng.uniform(np.log(1e-5), 0, n))
+    pa, pb = rng.uniform(0, 2 * np.pi, (2, n))
+    return mmin, pa, pb
+
+
+@pytest.mark.parametrize('inverted', [False, True])
+def test_exact_queries(table, inverted):
+    mmin, pa, pb = random_points(10_000)
+    assert np.allclose(table.eff_majorana_mass(mmin, pa, pb, inverted), eff_majorana_mass(mmin, pa, pb, inverted), rtol = 1e-12, atol = 0)
+
+
+@pytest.mark.parametrize('inverted', [False, True])
+def test_interpolation_within_error_bound(table, inverted):
+    mmin, pa, pb = random_points(100_000, seed = 2)
+    error = np.abs(table.interpolate(mmin, pa, pb, inverted) - eff_majorana_mass(mmin, pa, pb, inverted))
+    assert np.all(error <= table.error_bound(mmin, inverted) + 1e-15)
+    assert table.error_bound(1.0, inverted) < 1e-7
+
+
+def test_grid_phases_are_exact(table):
+    mmin = np.exp(table.log_mmin[::37])
+    phases = np.arange(table.n_phase)[::50] * table.phase_step
+    m, a, b = np.meshgrid(mmin, phases, phases, indexing = 'ij')
+    assert np.allclose(table.interpolate(m, a, b, True), eff_majorana_mass(m, a, b, True), rtol = 1e-12, atol = 1e-15)
+
+
+def test_phases_wrap_around(table):
+    mmin, pa, pb = random_points(1000, seed = 3)
+    expected = table.interpolate(mmin, pa, pb)
+    assert np.allclose(table.interpolate(mmin, pa + 2 * np.pi, pb - 4 * np.pi), expected)
+    assert np.allclose(table.interpolate(mmin, pa - 2 * np.pi, pb + 2 * np.pi), expected)
+    # Between the last grid phase and 2 pi the interpolation wraps back to the first one
+    last = 2 * np.pi - table.phase_step / 2
+    assert np.isclose(table.interpolate(0.1, last, 0.0), eff_majorana_mass(0.1, last, 0.0), rtol = 0, atol = table.error_bound(0.1))
+
+
+def test_masses_off_the_grid(table):
+    mmin = np.array([0.0, 1e-9, 2.0, 10.0])
+    for inverted in (False, True):
+        error = np.abs(table.interpolate(mmin, 1.0, 2.0, inverted) - eff_majorana_mass(mmin, 1.0, 2.0, inverted))
+        assert np.all(error <= table.error_bound(mmin, inverted) + 1e-15)
+
+        low, high = table.majorana_mass_bounds(mmin, inverted)
+        edges = np.exp(table.log_mmin[[0, 0, -1, -1]])
+        assert np.allclose(low, table.majorana_mass_bounds(edges, inverted)[0])
+        assert np.allclose(high, table.majorana_mass_bounds(edges, inverted)[1])
+
+
+def test_bounds(table):
+    mmin = np.exp(table.log_mmin[::11])
+    for inverted in (False, True):
+        low, high = table.majorana_mass_bounds(mmin, inverted)
+        exact_low, exact_high = majorana_mass_bounds(mmin, inverted)
+        assert np.allclose(low, exact_low) and np.allclose(high, exact_high)
+
+
+def test_bad_input(table):
+    with pytest.raises(ValueError):
+        table.interpolate(-1e-3, 0, 0)
+    with pytest.raises(ValueError):
+        table.interpolate(np.nan, 0, 0)
+    with pytest.raises(ValueError):
+        table.eff_majorana_mass(1e-3, np.inf, 0)
+    with pytest.raises(ValueError):
+        table.majorana_mass_bounds(np.nan)
+    with pytest.raises(ValueError):
+        table.error_bound(np.nan)
+
+
+def test_out(table):
+    mmin, pa, pb = random_points(24, seed = 4)
+    expected = eff_majorana_mass(mmin, pa, pb).reshape(4, 6)
+
+    out = np.zeros((4, 6))
+    assert table.eff_majorana_mass(mmin.reshape(4, 6), pa.reshape(4, 6), pb.reshape(4, 6), out = out) is out
+    assert np.allclose(out, expected)
+    with pytest.raises(ValueError):
+        table.eff_majorana_mass(mmin.reshape(4, 6), pa.reshape(4, 6), pb.reshape(4, 6), out = np.zeros((6, 4)).T)
+    with pytest.raises(ValueError):
+        table.interpolate(mmin.reshape(4, 6), pa.reshape(4, 6), pb.reshape(4, 6), out = np.zeros(24))
+
+
+def test_grid_in_table_name(tmp_path):
+    coarse = tables.generate_mbb_table(tmp_path, n_mmin = 16, n_phase = 8)
+    table = tables.load_mbb_table(tmp_path)
+    assert (coarse.n_phase, len(coarse.log_mmin)) == (8, 16)
+    assert (table.n_phase, len(table.log_mmin)) == (tables.N_PHASE, tables.N_MMIN)
+    assert tables.load_mbb_table(tmp_path, n_mmin = 16, n_phase = 8).n_phase == 8
+
+
+def test_stale_tables_removed(tmp_path):
+    for name in ('mbb_0000000000000000_16x8_1e-05-1_phases.npy', 'mbb_0000000000000000_16x8_1e-05-1_v3.json', 'mbb_bounds_0000000000000000_512.npy'):
+        (tmp_path / name).write_bytes(b'')
+    table = tables.generate_mbb_table(tmp_path, n_mmin = 16, n_phase = 8)
+    meta_path = tables._meta_path(tmp_path, tables._table_name(table.fingerprint, 16, 8, tables.MMIN_RANGE))
+    assert {p.name for p in tmp_path.iterdir()} == {table.meta['phase_file'], table.meta['bounds_file'], meta_path.name}
+
+
+def _load_in_worker(directory):
+    table = tables.load_mbb_table(directory)
+    return table.meta['phase_file'], float(table.interpolate(0.01, 1.0, 2.0))
+
+
+def test_concurrent_first_load(tmp_path):
+    with multiprocessing.get_context('fork').Pool(6) as pool:
+        results = pool.map(_load_in_worker, [tmp_path] * 6)
+    assert all(result == results[0] for result in results)
+    assert len(list(tmp_path.glob('*.npy'))) == 2
+    assert not list(tmp_path.glob('*.tmp'))